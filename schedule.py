@@ -1,152 +1,130 @@
+import importlib.util
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta, time
 import re
 
-def parse_time_string(time_str):
-    """
-    Converts a time string in 'HH:MM' format to a Python time object.
-    Returns None if the format is incorrect.
-    """
-    try:
-        if not isinstance(time_str, str):
-            time_str = str(time_str)
-        return datetime.strptime(time_str, '%H:%M').time()
-    except (ValueError, TypeError):
-        return None
+# Matches every 'HH:MM:in' or 'HH:MM:out' punch in a 'Punch Records' string
+PUNCH_PATTERN = re.compile(r'(\d{2}:\d{2}):(in|out)')
 
-def calculate_duration(in_time_str, out_time_str):
-    """
-    Calculates the time difference between an 'in' and 'out' punch.
-    Handles overnight shifts correctly.
-    """
-    in_time = parse_time_string(in_time_str)
-    out_time = parse_time_string(out_time_str)
+# The only report columns that are used; everything else in the sheet is skipped while reading
+REPORT_COLUMNS = ['Name', 'Punch Records', 'Status', 'Work Dur.', 'OT', 'Tot. Dur.']
 
-    if in_time and out_time:
-        dummy_date = datetime(2000, 1, 1)
-        dt_in = datetime.combine(dummy_date, in_time)
-        dt_out = datetime.combine(dummy_date, out_time)
+# Use the much faster calamine reader when it is installed, otherwise let pandas pick its default engine
+EXCEL_ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
 
-        if dt_out < dt_in:
-            dt_out += timedelta(days=1)
-        
-        return dt_out - dt_in
-    return timedelta(0)
-
-def format_timedelta(td):
+def format_minutes(total_minutes):
     """
-    Formats a timedelta object into a readable HH:MM:SS string.
+    Formats a Series of whole minutes into readable HH:MM:SS strings.
     """
-    td_in_seconds = int(td.total_seconds())
-    hours, remainder = divmod(td_in_seconds, 3600)
-    minutes, seconds = divmod(remainder, 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+    hours = (total_minutes // 60).astype(str).str.zfill(2)
+    minutes = (total_minutes % 60).astype(str).str.zfill(2)
+    return hours + ':' + minutes + ':00'
 
-def process_punch_records(punch_records_str):
+def process_punch_records(punch_records):
     """
-    Processes the 'Punch Records' string to calculate net work hours,
-    extracts shift timings and their durations, and accounts for a 30-minute break.
-    Returns a tuple: (net_work_duration, list_of_shifts_with_duration)
+    Processes the whole 'Punch Records' column at once to calculate net work hours,
+    attendance status and overtime, and extract the first two shift timings and their durations.
+    Accounts for a 30-minute break when there is only one shift.
+    Each distinct record is only processed once, since the same punch strings recur across days and employees.
+    Returns a DataFrame aligned with punch_records holding every calculated output column.
     """
-    if not isinstance(punch_records_str, str) or not punch_records_str.strip():
-        return timedelta(0), []
-
-    # Find all 'HH:MM:in' or 'HH:MM:out' patterns
-    pattern = re.compile(r'(\d{2}:\d{2}):(in|out)')
-    punches = pattern.findall(punch_records_str)
-    
-    if not punches:
-        return timedelta(0), []
-
-    parsed_punches = []
-    for time_str, punch_type in punches:
-        parsed_punches.append({'time_str': time_str, 'type': punch_type})
-    
-    parsed_punches.sort(key=lambda x: parse_time_string(x['time_str']))
-
-    total_work_duration = timedelta(0)
-    shifts = []
-    in_time = None
-    for punch in parsed_punches:
-        if punch['type'] == 'in':
-            in_time = punch['time_str']
-        elif punch['type'] == 'out' and in_time:
-            duration = calculate_duration(in_time, punch['time_str'])
-            total_work_duration += duration
-            # Store shift timing and its formatted duration
-            shift_info = {
-                "timing": f"{in_time} - {punch['time_str']}",
-                "duration": format_timedelta(duration)
-            }
-            shifts.append(shift_info)
-            in_time = None
+    codes, unique_records = pd.factorize(punch_records, use_na_sentinel=False)
+    records = pd.Series(unique_records)
+
+    # Find all 'HH:MM:in' or 'HH:MM:out' patterns, one row per punch
+    punches = records.astype('string').str.extractall(PUNCH_PATTERN)
+    punches.columns = ['time_str', 'type']
+    punches = punches.droplevel('match').rename_axis('record').reset_index()
+
+    # Read 'HH:MM' as ASCII digits to get minutes since midnight without any datetime parsing.
+    # There are at most 1440 distinct times, so each one is only converted once.
+    time_codes, unique_times = pd.factorize(punches['time_str'])
+    digits = pd.Series(unique_times).to_numpy(dtype='S5').view(np.uint8).reshape(-1, 5).astype(int) - ord('0')
+    punches['minutes'] = (digits @ [600, 60, 0, 10, 1])[time_codes]
+
+    # Sort each record's punches chronologically on the integer minutes, keeping the original order for ties
+    punches = punches.sort_values(['record', 'minutes'], kind='stable')
+
+    # From here on work on flat arrays, one entry per punch, with each record's punches next to each other
+    record = punches['record'].to_numpy(dtype=int)
+    minutes = punches['minutes'].to_numpy(dtype=int)
+    time_str = punches['time_str'].to_numpy(dtype=object)
+    is_in = (punches['type'] == 'in').to_numpy(dtype=bool)
+
+    # A shift is an 'out' punch directly preceded by an 'in' punch of the same record
+    shift_end = np.flatnonzero(~is_in[1:] & is_in[:-1] & (record[1:] == record[:-1])) + 1
+    shift_start = shift_end - 1
+    shift_record = record[shift_end]
+    shifts = pd.DataFrame({
+        'timing': time_str[shift_start] + ' - ' + time_str[shift_end],
+        # Handles overnight shifts correctly
+        'minutes': (minutes[shift_end] - minutes[shift_start]) % (24 * 60),
+    }, index=shift_record)
+    # Shifts are ordered by record, so a shift's number is its distance from the record's first shift
+    shift_number = np.arange(len(shift_record)) - np.searchsorted(shift_record, shift_record)
+
+    total_work_minutes = np.bincount(shift_record, weights=shifts['minutes'], minlength=len(records)).astype(int)
+    shift_count = np.bincount(shift_record, minlength=len(records))
 
     # If there's only one shift (one in/out pair), deduct the 30-minute break.
-    if len(shifts) == 1:
-        net_work_duration = total_work_duration - timedelta(minutes=30)
-        return max(net_work_duration, timedelta(0)), shifts
-    
     # If there are multiple shifts, the break is the time between them, so no deduction is needed.
-    return total_work_duration, shifts
-
-
-def get_first_in_time(punch_records_str):
-    """Helper function to get the earliest 'in' punch time from the record string."""
-    if not isinstance(punch_records_str, str) or not punch_records_str.strip():
-        return None
-
-    pattern = re.compile(r'(\d{2}:\d{2}):(in|out)')
-    punches = pattern.findall(punch_records_str)
-    
-    in_punch_times = [parse_time_string(p[0]) for p in punches if p[1] == 'in' and parse_time_string(p[0]) is not None]
-    
-    if not in_punch_times:
-        return None
-
-    return min(in_punch_times)
-
-def determine_status_and_ot(row):
+    net_work_minutes = pd.Series(np.where(shift_count == 1, np.maximum(total_work_minutes - 30, 0), total_work_minutes))
+
+    # Punches are sorted, so the first 'in' of each record is its earliest one
+    first_in_minutes = np.full(len(records), -1)
+    in_record, first_in_position = np.unique(record[is_in], return_index=True)
+    first_in_minutes[in_record] = minutes[is_in][first_in_position]
+
+    status, overtime_minutes = determine_status_and_ot(net_work_minutes, pd.Series(first_in_minutes))
+
+    # Build every output column in one go, storing the first two shift timings and their formatted durations
+    first_shift = shifts[shift_number == 0]
+    second_shift = shifts[shift_number == 1]
+    result = pd.DataFrame({
+        'Calculated Status': status,
+        'Calculated Hours (HH:MM:SS)': format_minutes(net_work_minutes),
+        'Calculated OT (HH:MM:SS)': format_minutes(overtime_minutes),
+        'Shift 1': first_shift['timing'].reindex(records.index, fill_value=''),
+        'Shift 1 Duration': format_minutes(first_shift['minutes']).reindex(records.index, fill_value=''),
+        'Shift 2': second_shift['timing'].reindex(records.index, fill_value=''),
+        'Shift 2 Duration': format_minutes(second_shift['minutes']).reindex(records.index, fill_value=''),
+    })
+
+    # Expand the per-record results back to one row per punch record
+    return result.take(codes).set_axis(punch_records.index)
+
+def determine_status_and_ot(net_work_minutes, first_in_times):
     """
-    Determines attendance status and calculates overtime based on net work duration and arrival time.
-    Returns a tuple: (status, overtime_duration)
+    Determines attendance status and calculates overtime in minutes for all rows at once,
+    based on net work minutes and arrival time (minutes since midnight, -1 if none).
+    Returns a tuple: (status_array, overtime_minutes_series)
     """
-    net_work_duration = row['Calculated Hours']
-    punch_records = row['Punch Records']
-
     # --- ATTENDANCE & OT RULES ---
-    LATE_ARRIVAL_START = time(10, 30)
-    LATE_ARRIVAL_END = time(13, 30)
-    HALF_DAY_MIN_DURATION = timedelta(hours=4)
-    FULL_DAY_MIN_DURATION = timedelta(hours=8) # 8 hours of net work
-    STANDARD_WORKDAY = timedelta(hours=8)
+    LATE_ARRIVAL_START = 10 * 60 + 30 # 10:30, in minutes since midnight
+    LATE_ARRIVAL_END = 13 * 60 + 30 # 13:30, in minutes since midnight
+    HALF_DAY_MIN_DURATION = 4 * 60
+    FULL_DAY_MIN_DURATION = 8 * 60 # 8 hours of net work
+    STANDARD_WORKDAY = 8 * 60
     # --------------------------------
 
-    first_in_time = get_first_in_time(punch_records)
-    overtime = timedelta(0)
-    status = "Absent" # Default status
-
-    # Rule 1: No OT for late arrivals
-    if first_in_time and first_in_time > LATE_ARRIVAL_START:
-        overtime = timedelta(0)
-        # Determine status for late arrivals
-        if first_in_time > LATE_ARRIVAL_END:
-            status = "Absent"
-        else:
-            status = "Half Day"
-    else: # On-time arrivals
-        # Calculate OT for on-time arrivals
-        if net_work_duration > STANDARD_WORKDAY:
-            overtime = net_work_duration - STANDARD_WORKDAY
-
-        # Determine status for on-time arrivals
-        if net_work_duration < HALF_DAY_MIN_DURATION:
-            status = "Absent"
-        elif net_work_duration >= FULL_DAY_MIN_DURATION:
-            status = "Full Day"
-        else:
-            status = "Half Day"
-            
-    return status, overtime
+    net_work_min = net_work_minutes.to_numpy()
+    first_in_min = first_in_times.to_numpy()
+
+    late = first_in_min > LATE_ARRIVAL_START
+    very_late = first_in_min > LATE_ARRIVAL_END
+
+    # Rule 1: Late arrivals are Absent after LATE_ARRIVAL_END, otherwise Half Day.
+    # On-time arrivals are graded by net work duration.
+    status = np.select(
+        [very_late, late, net_work_min < HALF_DAY_MIN_DURATION, net_work_min >= FULL_DAY_MIN_DURATION],
+        ["Absent", "Half Day", "Absent", "Full Day"],
+        default="Half Day"
+    )
+
+    # Rule 2: No OT for late arrivals
+    overtime = np.where(late, 0, np.maximum(net_work_min - STANDARD_WORKDAY, 0))
+
+    return status, pd.Series(overtime, index=net_work_minutes.index)
 
 
 def analyze_attendance_report(file_path):
@@ -156,36 +134,31 @@ def analyze_attendance_report(file_path):
     """
     print(f"\nProcessing file: {file_path}")
     try:
-        df = pd.read_excel(file_path, header=9, sheet_name=0)
+        # Header names can carry stray spaces, so match them the same way the columns are cleaned below
+        df = pd.read_excel(
+            file_path,
+            header=9,
+            sheet_name=0,
+            usecols=lambda col: str(col).strip() in REPORT_COLUMNS,
+            engine=EXCEL_ENGINE
+        )
 
         print("Columns found in Excel file:", df.columns.tolist())
         
         df.columns = df.columns.str.strip()
         df.dropna(subset=['Name'], inplace=True)
 
+        # Names and statuses are a small set of repeated strings, so store them as categories
+        df['Name'] = df['Name'].astype('category')
+        if 'Status' in df.columns:
+            df['Status'] = df['Status'].astype('category')
+
         if 'Punch Records' not in df.columns:
             print("Error: 'Punch Records' column not found.")
             return pd.DataFrame()
 
-        # Apply the function to get both duration and shifts
-        punch_data = df['Punch Records'].apply(process_punch_records)
-        
-        # Separate the results into new columns
-        df['Calculated Hours'] = punch_data.apply(lambda x: x[0])
-        df['Shifts'] = punch_data.apply(lambda x: x[1])
-        df['Shift 1'] = df['Shifts'].apply(lambda x: x[0]['timing'] if len(x) > 0 else '')
-        df['Shift 1 Duration'] = df['Shifts'].apply(lambda x: x[0]['duration'] if len(x) > 0 else '')
-        df['Shift 2'] = df['Shifts'].apply(lambda x: x[1]['timing'] if len(x) > 1 else '')
-        df['Shift 2 Duration'] = df['Shifts'].apply(lambda x: x[1]['duration'] if len(x) > 1 else '')
-
-        # Apply function to get status and OT
-        status_ot_data = df.apply(determine_status_and_ot, axis=1)
-        df['Calculated Status'] = status_ot_data.apply(lambda x: x[0])
-        df['Calculated OT'] = status_ot_data.apply(lambda x: x[1])
-
-        df['Calculated Hours (HH:MM:SS)'] = df['Calculated Hours'].apply(format_timedelta)
-        df['Calculated OT (HH:MM:SS)'] = df['Calculated OT'].apply(format_timedelta)
-
+        # Calculate hours, status, OT and shifts for the whole column in one go
+        df = df.join(process_punch_records(df['Punch Records']))
 
         # Define the final columns for the output file
         final_cols = ['Name', 'Calculated Status', 'Calculated Hours (HH:MM:SS)', 'Calculated OT (HH:MM:SS)', 'Shift 1', 'Shift 1 Duration', 'Shift 2', 'Shift 2 Duration']
@@ -207,6 +180,33 @@ def analyze_attendance_report(file_path):
         print(f"An unexpected error occurred: {e}")
         return None, None
 
+def save_report(report_df, output_file):
+    """
+    Writes the report to an Excel file one row at a time, so the whole workbook
+    is never held in memory. Uses xlsxwriter when it is installed, otherwise openpyxl.
+    """
+    rows = report_df.itertuples(index=False, name=None)
+
+    if importlib.util.find_spec('xlsxwriter'):
+        import xlsxwriter
+
+        # constant_memory flushes each row to disk once the next one is started
+        workbook = xlsxwriter.Workbook(output_file, {'constant_memory': True})
+        worksheet = workbook.add_worksheet()
+        worksheet.write_row(0, 0, report_df.columns)
+        for row_number, row in enumerate(rows, start=1):
+            worksheet.write_row(row_number, 0, row)
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Sheet1')
+        worksheet.append(list(report_df.columns))
+        for row in rows:
+            worksheet.append(row)
+        workbook.save(output_file)
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
     input_file = "INPUT FILE NAME.xlsx"
@@ -224,8 +224,10 @@ if __name__ == "__main__":
             print("\n\n--- Confusion Matrix ---")
             print("Compares original report status vs. new calculated status.")
             
+            # Status is categorical, so only its distinct labels need stripping
+            original_status = console_df['Status'].map(lambda status: status.strip() if isinstance(status, str) else np.nan)
             confusion_matrix = pd.crosstab(
-                console_df['Status'].str.strip(),
+                original_status,
                 console_df['Calculated Status'],
                 rownames=['Original Status'],
                 colnames=['Calculated Status']
@@ -235,7 +237,7 @@ if __name__ == "__main__":
 
         try:
             # Save the dataframe with only the new columns to the Excel file
-            final_df.to_excel(output_file, index=False)
+            save_report(final_df, output_file)
             print(f"\nSuccessfully created/updated the report at: {output_file}")
             print("The saved file now contains the 'Name', 'Calculated Status', 'Calculated Hours', 'Calculated OT', 'Shift 1', 'Shift 1 Duration', 'Shift 2', and 'Shift 2 Duration' columns.")
         except Exception as e: